@@ -3,40 +3,252 @@ server.py - Dashboard for X-Ray traces
 The UI part that shows you what's actually happening inside your code
 """
 
+import gzip
+import hashlib
 import json
+import math
 import os
+import re
 import html
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import urllib.parse
 from datetime import datetime
 
-class DashboardHandler(BaseHTTPRequestHandler):
-    """Handles the dashboard requests"""
+# orjson is a lot faster for big trace files, but stdlib json works fine too
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data):
+    """Parse JSON from bytes/str"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # orjson is strict - e.g. the NaN/Infinity stdlib json writes
+    return json.loads(data)
+
+
+def _json_dumps(data, indent=False):
+    """Serialize to JSON bytes, unknown types become strings"""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        try:
+            return orjson.dumps(data, default=str, option=option)
+        except TypeError:
+            pass  # Ints over 64 bits, lone surrogates... stdlib json copes
+    return json.dumps(data, default=str, indent=2 if indent else None).encode()
+
+
+# file name -> (mtime, summary, summary as JSON bytes), so the list
+# endpoint only parses changed files and never re-serializes summaries
+_META_CACHE = {}
+
+# file name -> mtime of trace files that failed to read, so a broken file
+# is only retried (and complained about) once it changes. Never listed
+_BAD_FILES = {}
+
+_META_LOCK = threading.Lock()  # requests are handled on several threads
+
+# The /api/traces and /api/stats bodies, kept until a trace file
+# changes (_LIST_BYTES = None means rebuild both)
+_LIST_BYTES = None
+_STATS_BYTES = None
+
+# How often (seconds) the live stream checks for changed trace files,
+# and how long it stays quiet before sending a keep-alive
+STREAM_INTERVAL = 1
+STREAM_KEEPALIVE = 15
+
+# Trace ids end up in file names, so only allow plain ones (no "../" etc.)
+_ID_RE = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+# Summaries are also kept on disk, so a restart doesn't re-parse every trace
+INDEX_FILE = '_index.json'
+INDEX_VERSION = 3  # bump when the summary fields change
+
+
+def _as_number(value):
+    """value if it's a usable number, else 0 - trace files can hold anything"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            if math.isfinite(value):
+                return value
+        except OverflowError:
+            pass  # int too big for a float
+    return 0
+
+
+def _trace_summary(file_name, data):
+    """Pick out the fields the trace list needs"""
+    start_time = data.get("start_time", "")
     
-    def do_GET(self):
-        """GET requests - serve page or API data"""
-        path = urllib.parse.urlparse(self.path).path
+    # Numeric start time (epoch ms) so nobody has to parse dates to sort
+    try:
+        start_ts = datetime.fromisoformat(start_time).timestamp() * 1000
+    except (TypeError, ValueError):
+        start_ts = 0
+    
+    return {
+        "id": data.get("id", file_name.replace('trace_', '').replace('.json', '')),
+        "name": data.get("name", "Trace"),
+        "start_time": start_time,
+        "start_ts": start_ts,
+        "total_steps": _as_number(data.get("total_steps")),
+        "total_duration_ms": _as_number(data.get("total_duration_ms"))
+    }
+
+
+def _cache_entry(mtime, summary):
+    """Build a _META_CACHE value - the summary is serialized right away"""
+    return (mtime, summary, _json_dumps(summary))
+
+
+def _save_index():
+    """Write _META_CACHE to the index file (call with _META_LOCK held)"""
+    index = {
+        "version": INDEX_VERSION,
+        "traces": {
+            file: {"mtime": mtime, "summary": summary}
+            for file, (mtime, summary, _) in _META_CACHE.items()
+        }
+    }
+    tmp_name = INDEX_FILE + '.tmp'
+    try:
+        with open(tmp_name, 'wb') as f:
+            f.write(_json_dumps(index))
+        os.replace(tmp_name, INDEX_FILE)
+    except Exception as e:
+        print(f"Couldn't save {INDEX_FILE}: {e}")
+
+
+def _load_index():
+    """Fill _META_CACHE from the index file, or build the index if missing"""
+    try:
+        with open(INDEX_FILE, 'rb') as f:
+            index = _json_loads(f.read())
+        # Older index - its summaries are missing fields, just rebuild
+        if index.get("version") == INDEX_VERSION:
+            with _META_LOCK:
+                for file, entry in index["traces"].items():
+                    _META_CACHE[file] = _cache_entry(entry["mtime"], entry["summary"])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Couldn't read {INDEX_FILE}, rebuilding: {e}")
+    
+    # Picks up anything written since, and saves the index if it changed
+    _scan_traces()
+
+
+def _scan_traces():
+    """Sync _META_CACHE with the trace files on disk"""
+    global _LIST_BYTES
+    seen = set()  # read fine
+    present = set()  # every trace file, broken or not
+    changed = False
+    
+    # Look for trace files - only re-read the ones that changed
+    with _META_LOCK:
+        with os.scandir('.') as entries:
+            for entry in entries:
+                file = entry.name
+                if not (file.startswith('trace_') and file.endswith('.json')):
+                    continue
+                present.add(file)
+                mtime = None
+                try:
+                    mtime = entry.stat().st_mtime_ns
+                    if _BAD_FILES.get(file) == mtime:
+                        continue  # Still the same broken file
+                    cached = _META_CACHE.get(file)
+                    if cached is None or cached[0] != mtime:
+                        with open(file, 'rb') as f:
+                            data = _json_loads(f.read())
+                        _META_CACHE[file] = _cache_entry(mtime, _trace_summary(file, data))
+                        _BAD_FILES.pop(file, None)
+                        changed = True
+                    seen.add(file)
+                except Exception as e:
+                    print(f"Error reading {file}: {e}")
+                    if mtime is not None:
+                        _BAD_FILES[file] = mtime
+                    continue
         
-        if path == '/':
-            self._show_dashboard()
-        elif path == '/api/traces':
-            self._send_trace_list()
-        elif path.startswith('/api/trace/'):
-            trace_id = path.split('/')[-1]
-            self._send_single_trace(trace_id)
-        else:
-            self.send_error(404, "Not found")
+        # Forget files that are gone (or broke)
+        for file in list(_META_CACHE):
+            if file not in seen:
+                del _META_CACHE[file]
+                changed = True
+        for file in list(_BAD_FILES):
+            if file not in present:
+                del _BAD_FILES[file]
+        
+        if changed:
+            _LIST_BYTES = None
+            _save_index()
+
+
+def _trace_stats(trace_files):
+    """Totals shown at the top of the sidebar"""
+    count = len(trace_files)
+    if count == 0:
+        return {"total_traces": 0, "avg_time_ms": 0, "avg_steps": 0}
     
-    def do_POST(self):
-        """POST requests - for saving new traces"""
-        if self.path == '/api/traces':
-            self._save_new_trace()
-        else:
-            self.send_error(404)
+    total_ms = sum(t.get("total_duration_ms") or 0 for t in trace_files)
+    total_steps = sum(t.get("total_steps") or 0 for t in trace_files)
+    return {
+        "total_traces": count,
+        "avg_time_ms": int(total_ms / count + 0.5),  # same rounding as JS Math.round
+        "avg_steps": int(total_steps / count + 0.5)
+    }
+
+
+def _list_and_stats_bytes():
+    """(trace list, stats) as JSON bytes - the list is newest first"""
+    global _LIST_BYTES, _STATS_BYTES
+    _scan_traces()
     
-    def _show_dashboard(self):
-        """Show the main dashboard page"""
-        html_content = '''
+    with _META_LOCK:
+        if _LIST_BYTES is None:
+            # Splice the pre-serialized summaries, newest first
+            entries = sorted(
+                _META_CACHE.values(), key=lambda e: e[1]["start_ts"], reverse=True
+            )
+            _LIST_BYTES = b'[' + b','.join(e[2] for e in entries) + b']'
+            try:
+                stats = _trace_stats([e[1] for e in entries])
+            except (TypeError, ValueError, OverflowError):
+                # Odd totals shouldn't take the trace list down with them
+                stats = {"total_traces": len(entries), "avg_time_ms": 0, "avg_steps": 0}
+            _STATS_BYTES = _json_dumps(stats)
+        return _LIST_BYTES, _STATS_BYTES
+
+
+def _remember_trace(file_name, trace, tmp_name=None):
+    """Record a trace we just wrote, without reading it back.
+    
+    With tmp_name, that file is first moved into place - under the lock, so
+    when two saves of one id race the cache describes the one that won.
+    """
+    global _LIST_BYTES
+    with _META_LOCK:
+        if tmp_name is not None:
+            os.replace(tmp_name, file_name)
+        mtime = os.stat(file_name).st_mtime_ns
+        _BAD_FILES.pop(file_name, None)
+        _META_CACHE[file_name] = _cache_entry(mtime, _trace_summary(file_name, trace))
+        _LIST_BYTES = None
+        _save_index()
+
+
+# The dashboard page never changes, so build it (and its gzip) once at import
+_DASHBOARD_TEMPLATE = '''
 <!DOCTYPE html>
 <html>
 <head>
@@ -462,30 +674,16 @@ class DashboardHandler(BaseHTTPRequestHandler):
     <script>
         let traces = [];
         let currentTrace = null;
-        
-        // Load traces
-        async function loadTraces() {
-            try {
-                const res = await fetch('/api/traces');
-                traces = await res.json();
-                
-                // Newest first
-                traces.sort((a, b) => new Date(b.start_time) - new Date(a.start_time));
-                
-                updateTraceList();
-                updateStats();
-                updateTime();
-                
-                // Show first trace if nothing selected
-                if (traces.length > 0 && !currentTrace) {
-                    showTrace(traces[0].id);
-                }
-                
-            } catch (err) {
-                console.error('Failed to load traces:', err);
-                document.getElementById('trace-list').innerHTML = 
-                    '<div class="empty"><p>Error loading traces</p></div>';
+        const traceCache = new Map();  // id -> full trace, cleared when the list changes
+        
+        // Escape the list fields once when traces arrive, not on every render
+        function prepareTraces(list) {
+            for (const t of list) {
+                t._id = escape(t.id);
+                t._name = escape(t.name || 'Untitled Trace');
+                t._search = escape((t.id + ' ' + (t.name || '')).toLowerCase());
             }
+            return list;
         }
         
         // Update trace list
@@ -497,24 +695,36 @@ class DashboardHandler(BaseHTTPRequestHandler):
                 return;
             }
             
-            list.innerHTML = traces.map(trace => `
-                <div class="trace-item ${currentTrace?.id === trace.id ? 'selected' : ''}" 
-                     onclick="showTrace('${trace.id}')">
-                    <div class="trace-id">${trace.id}</div>
-                    <div class="trace-name">${escape(trace.name || 'Untitled Trace')}</div>
-                    <div class="trace-info">
-                        <span>${trace.total_steps || 0} steps</span>
-                        <span>${trace.total_duration_ms || 0}ms</span>
-                    </div>
-                </div>
-            `).join('');
+            // One flat array joined once - no per-row template strings
+            const parts = [];
+            for (let i = 0; i < traces.length; i++) {
+                const t = traces[i];
+                parts.push(
+                    '<div class="trace-item', currentTrace?.id === t.id ? ' selected' : '',
+                    '" data-trace-id="', t._id, '" data-search="', t._search,
+                    '"><div class="trace-id">', t._id,
+                    '</div><div class="trace-name">', t._name,
+                    '</div><div class="trace-info"><span>', t.total_steps || 0,
+                    ' steps</span><span>', t.total_duration_ms || 0, 'ms</span></div></div>'
+                );
+            }
+            parts.push('<div class="empty" id="no-matches" style="display: none;"><p>No matches found</p></div>');
+            list.innerHTML = parts.join('');
+            
+            // Keep whatever the user is searching for
+            applySearch();
         }
         
         // Show a specific trace
         async function showTrace(traceId) {
             try {
-                const res = await fetch('/api/trace/' + traceId);
-                currentTrace = await res.json();
+                let trace = traceCache.get(traceId);
+                if (!trace) {
+                    const res = await fetch('/api/trace/' + traceId);
+                    trace = await res.json();
+                    traceCache.set(traceId, trace);
+                }
+                currentTrace = trace;
                 
                 // Update UI
                 document.getElementById('empty-state').style.display = 'none';
@@ -525,8 +735,8 @@ class DashboardHandler(BaseHTTPRequestHandler):
                     item.classList.remove('selected');
                 });
                 
-                const selectedItem = Array.from(document.querySelectorAll('.trace-item')).find(item => 
-                    item.querySelector('.trace-id').textContent === traceId
+                const selectedItem = document.querySelector(
+                    '.trace-item[data-trace-id="' + CSS.escape(traceId) + '"]'
                 );
                 if (selectedItem) {
                     selectedItem.classList.add('selected');
@@ -554,7 +764,8 @@ class DashboardHandler(BaseHTTPRequestHandler):
                 return;
             }
             
-            const stepsHtml = trace.steps.map(step => `
+            // I/O is filled in by toggleIO the first time it's opened
+            const stepsHtml = trace.steps.map((step, i) => `
                 <div class="step">
                     <div class="step-header">
                         <div class="step-title">${step.name}</div>
@@ -582,20 +793,20 @@ class DashboardHandler(BaseHTTPRequestHandler):
                         </div>
                     ` : ''}
                     
-                    <button class="io-toggle" onclick="toggleIO(this)">
+                    <button class="io-toggle" data-step="${i}">
                         Show Input/Output
                     </button>
                     
                     <div class="io-content">
                         <div class="io-section">
                             <div class="info-label">Input</div>
-                            <pre>${escape(JSON.stringify(step.input || {}, null, 2))}</pre>
+                            <pre data-io="input"></pre>
                         </div>
                         
                         ${step.output ? `
                         <div class="io-section">
                             <div class="info-label">Output</div>
-                            <pre>${escape(JSON.stringify(step.output || {}, null, 2))}</pre>
+                            <pre data-io="output"></pre>
                         </div>
                         ` : ''}
                     </div>
@@ -622,64 +833,57 @@ class DashboardHandler(BaseHTTPRequestHandler):
             });
         }
         
-        // Search traces
+        // Search traces - just hide the items that don't match,
+        // and wait for the user to stop typing first
+        let searchQuery = '';
+        let searchTimer = null;
+        
         function searchTraces(query) {
-            if (!query.trim()) {
-                updateTraceList();
-                return;
-            }
-            
-            const filtered = traces.filter(trace => 
-                trace.name?.toLowerCase().includes(query.toLowerCase()) ||
-                trace.id.toLowerCase().includes(query.toLowerCase())
-            );
-            
-            const list = document.getElementById('trace-list');
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => {
+                searchQuery = query.trim().toLowerCase();
+                applySearch();
+            }, 150);
+        }
+        
+        function applySearch() {
+            let shown = 0;
+            document.querySelectorAll('.trace-item').forEach(el => {
+                const match = el.dataset.search.includes(searchQuery);
+                el.style.display = match ? '' : 'none';
+                if (match) shown++;
+            });
             
-            if (filtered.length === 0) {
-                list.innerHTML = '<div class="empty"><p>No matches found</p></div>';
-                return;
+            const noMatches = document.getElementById('no-matches');
+            if (noMatches) {
+                noMatches.style.display = shown === 0 ? '' : 'none';
             }
-            
-            list.innerHTML = filtered.map(trace => `
-                <div class="trace-item" onclick="showTrace('${trace.id}')">
-                    <div class="trace-id">${trace.id}</div>
-                    <div class="trace-name">${escape(trace.name || 'Untitled Trace')}</div>
-                    <div class="trace-info">
-                        <span>${trace.total_steps || 0} steps</span>
-                        <span>${trace.total_duration_ms || 0}ms</span>
-                    </div>
-                </div>
-            `).join('');
         }
         
         // Toggle I/O visibility
         function toggleIO(button) {
             const content = button.nextElementSibling;
+            
+            // Big I/O blobs are only stringified once, on first open
+            if (!content.dataset.rendered) {
+                const step = currentTrace.steps[button.dataset.step];
+                content.querySelectorAll('pre[data-io]').forEach(pre => {
+                    pre.textContent = JSON.stringify(step[pre.dataset.io] || {}, null, 2);
+                });
+                content.dataset.rendered = '1';
+            }
+            
             content.classList.toggle('show');
             button.textContent = content.classList.contains('show') 
                 ? 'Hide Input/Output' 
                 : 'Show Input/Output';
         }
         
-        // Update stats
-        function updateStats() {
-            if (traces.length === 0) {
-                document.getElementById('total-traces').textContent = '0';
-                document.getElementById('avg-time').textContent = '0ms';
-                document.getElementById('avg-steps').textContent = '0';
-                return;
-            }
-            
-            document.getElementById('total-traces').textContent = traces.length;
-            
-            const totalTime = traces.reduce((sum, trace) => sum + (trace.total_duration_ms || 0), 0);
-            const avgTime = Math.round(totalTime / traces.length);
-            document.getElementById('avg-time').textContent = avgTime + 'ms';
-            
-            const totalSteps = traces.reduce((sum, trace) => sum + (trace.total_steps || 0), 0);
-            const avgSteps = Math.round(totalSteps / traces.length);
-            document.getElementById('avg-steps').textContent = avgSteps;
+        // Update stats - the server already worked them out
+        function updateStats(stats) {
+            document.getElementById('total-traces').textContent = stats.total_traces;
+            document.getElementById('avg-time').textContent = stats.avg_time_ms + 'ms';
+            document.getElementById('avg-steps').textContent = stats.avg_steps;
         }
         
         // Update time
@@ -691,117 +895,261 @@ class DashboardHandler(BaseHTTPRequestHandler):
                 `Last updated: ${dateStr} ${timeStr}`;
         }
         
-        // Refresh just the list
-        async function refreshList() {
-            if (currentTrace) return; // Don't refresh if viewing a trace
-            
-            try {
-                const res = await fetch('/api/traces');
-                const newTraces = await res.json();
-                newTraces.sort((a, b) => new Date(b.start_time) - new Date(a.start_time));
-                
-                traces = newTraces;
-                updateTraceList();
-                updateStats();
-                updateTime();
-            } catch (err) {
-                console.error('Refresh failed:', err);
-            }
-        }
+        // Escape HTML - one pass over the string with a lookup table
+        const ESC_MAP = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#039;'};
+        const ESC_RE = /[&<>"']/g;
         
-        // Escape HTML
         function escape(text) {
-            if (!text) return '';
-            return text.toString()
-                .replace(/&/g, '&amp;')
-                .replace(/</g, '&lt;')
-                .replace(/>/g, '&gt;')
-                .replace(/"/g, '&quot;')
-                .replace(/'/g, '&#039;');
+            return text == null ? '' : String(text).replace(ESC_RE, c => ESC_MAP[c]);
         }
         
-        // Auto-refresh every 10s
-        setInterval(refreshList, 10000);
-        
-        // Initial load
-        loadTraces();
+        // One click handler per container instead of one per item
+        document.getElementById('trace-list').addEventListener('click', e => {
+            const item = e.target.closest('.trace-item');
+            if (item) showTrace(item.dataset.traceId);
+        });
+        
+        document.getElementById('steps-container').addEventListener('click', e => {
+            const button = e.target.closest('.io-toggle');
+            if (button) toggleIO(button);
+        });
+        
+        // Live updates - the server pushes the list (and stats) as soon as we
+        // connect, then again whenever trace files change. That first push
+        // is the initial load, so there's no separate fetch
+        let listLoaded = false;
+        const stream = new EventSource('/api/stream');
+        stream.onmessage = e => {
+            traces = prepareTraces(JSON.parse(e.data));  // server sends newest first
+            traceCache.clear();
+            listLoaded = true;
+            updateTraceList();
+            updateTime();
+            
+            // Show first trace if nothing selected
+            if (traces.length > 0 && !currentTrace) {
+                showTrace(traces[0].id);
+            }
+        };
+        stream.addEventListener('stats', e => updateStats(JSON.parse(e.data)));
+        stream.onerror = () => {
+            // The browser keeps retrying - just say so if we never got a list
+            if (!listLoaded) {
+                document.getElementById('trace-list').innerHTML = 
+                    '<div class="empty"><p>Error loading traces</p></div>';
+            }
+        };
     </script>
 </body>
 </html>
-        '''
+'''
+
+
+def _minify_css(css):
+    """Drop comments and squeeze the whitespace out of a CSS block"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,])\s*', r'\1', css)
+    return css.strip()
+
+
+_DASHBOARD_HTML = re.sub(
+    r'<style>(.*?)</style>',
+    lambda m: '<style>' + _minify_css(m.group(1)) + '</style>',
+    _DASHBOARD_TEMPLATE,
+    flags=re.S
+).encode()
+_DASHBOARD_HTML_GZ = gzip.compress(_DASHBOARD_HTML, compresslevel=6)
+_DASHBOARD_ETAG = '"' + hashlib.sha1(_DASHBOARD_HTML).hexdigest() + '"'
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """Handles the dashboard requests"""
+    
+    def do_GET(self):
+        """GET requests - serve page or API data"""
+        path = urllib.parse.urlparse(self.path).path
         
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        self.wfile.write(html_content.encode())
+        if path == '/':
+            self._show_dashboard()
+        elif path == '/api/traces':
+            self._send_trace_list()
+        elif path == '/api/stats':
+            self._send_stats()
+        elif path == '/api/stream':
+            self._stream_traces()
+        elif path.startswith('/api/trace/'):
+            trace_id = path.split('/')[-1]
+            self._send_single_trace(trace_id)
+        else:
+            self.send_error(404, "Not found")
+    
+    def do_POST(self):
+        """POST requests - for saving new traces"""
+        path = urllib.parse.urlparse(self.path).path
+        
+        if path == '/api/traces':
+            self._save_new_trace()
+        else:
+            self.send_error(404)
+    
+    def _show_dashboard(self):
+        """Show the main dashboard page"""
+        # Browser already has this exact page
+        if self.headers.get('If-None-Match') == _DASHBOARD_ETAG:
+            self._write_full(304, [('ETag', _DASHBOARD_ETAG)])
+            return
+        
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = _DASHBOARD_HTML_GZ if gzipped else _DASHBOARD_HTML
+        
+        headers = [('Content-type', 'text/html; charset=utf-8')]
+        if gzipped:
+            headers.append(('Content-Encoding', 'gzip'))
+        headers += [
+            ('Content-Length', len(body)),
+            ('Vary', 'Accept-Encoding'),
+            ('Cache-Control', 'public, max-age=3600'),
+            ('ETag', _DASHBOARD_ETAG),
+        ]
+        self._write_full(200, headers, body)
     
     def _send_trace_list(self):
         """Send list of all traces"""
-        trace_files = []
-        
-        # Look for trace files
-        for file in os.listdir('.'):
-            if file.startswith('trace_') and file.endswith('.json'):
-                try:
-                    with open(file, 'r') as f:
-                        data = json.load(f)
-                        trace_files.append({
-                            "id": data.get("id", file.replace('trace_', '').replace('.json', '')),
-                            "name": data.get("name", "Trace"),
-                            "start_time": data.get("start_time", ""),
-                            "total_steps": data.get("total_steps", 0),
-                            "total_duration_ms": data.get("total_duration_ms", 0)
-                        })
-                except Exception as e:
-                    print(f"Error reading {file}: {e}")
-                    continue
-        
-        # Sort by time
-        trace_files.sort(key=lambda x: x.get("start_time", ""), reverse=True)
+        self._send_json_bytes(_list_and_stats_bytes()[0])
+    
+    def _send_stats(self):
+        """Send trace totals (count, average time and steps)"""
+        self._send_json_bytes(_list_and_stats_bytes()[1])
+    
+    def _stream_traces(self):
+        """Push the trace list to the browser whenever trace files change"""
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
         
-        self._send_json_response(trace_files)
+        last_sent = None
+        idle = 0
+        try:
+            while True:
+                # Same bytes object back means nothing changed
+                body, stats = _list_and_stats_bytes()
+                if body is not last_sent:
+                    self.wfile.write(
+                        b'data: ' + body + b'\n\n'
+                        b'event: stats\ndata: ' + stats + b'\n\n'
+                    )
+                    last_sent = body
+                    idle = 0
+                elif idle >= STREAM_KEEPALIVE:
+                    # Comment line - lets us notice when the browser is gone
+                    self.wfile.write(b': ping\n\n')
+                    idle = 0
+                self.wfile.flush()
+                
+                time.sleep(STREAM_INTERVAL)
+                idle += STREAM_INTERVAL
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Browser closed the page
     
     def _send_single_trace(self, trace_id):
         """Send one trace's details"""
+        if not _ID_RE.fullmatch(trace_id):
+            self.send_error(400, "Invalid trace id")
+            return
+        
         file_name = f"trace_{trace_id}.json"
         
-        if os.path.exists(file_name):
-            with open(file_name, 'r') as f:
-                trace_data = json.load(f)
-            self._send_json_response(trace_data)
-        else:
+        # Just try to open it - one lookup instead of exists() + stat() + open()
+        try:
+            f = open(file_name, 'rb')
+        except FileNotFoundError:
             self.send_error(404, f"Trace {trace_id} not found")
+            return
+        
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            self._write_full(200, [
+                ('Content-type', 'application/json'),
+                ('Content-Length', size),
+                ('Access-Control-Allow-Origin', '*'),
+            ])
+            
+            # The file is already JSON - no need to parse and re-encode it.
+            # socket.sendfile() goes kernel-to-socket where the OS supports it
+            self.connection.sendfile(f, 0, size)
     
     def _save_new_trace(self):
         """Save a trace from POST"""
         try:
             length = int(self.headers['Content-Length'])
             data = self.rfile.read(length)
+            # stdlib json on purpose: orjson turns ints over 64 bits into
+            # floats, and a saved trace has to keep what it was sent
             trace = json.loads(data)
             
-            file_name = f"trace_{trace['id']}.json"
-            with open(file_name, 'w') as f:
-                json.dump(trace, f, indent=2)
+            trace_id = trace.get('id')
+            if not isinstance(trace_id, str) or not _ID_RE.fullmatch(trace_id):
+                self.send_error(400, "Invalid trace id")
+                return
+            
+            # Compact by default - the dashboard formats it for display anyway.
+            # ?pretty=1 keeps the file human-readable for debugging
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            if query.get('pretty') == ['1']:
+                payload = json.dumps(trace, indent=2).encode()
+            else:
+                payload = json.dumps(trace, separators=(',', ':')).encode()
             
-            self.send_response(201)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            # Write to a temp file first so readers never see half a trace.
+            # Each request gets its own temp file - two saves of the same id
+            # can run at once, and the last one moved into place wins
+            file_name = f"trace_{trace_id}.json"
+            fd, tmp_name = tempfile.mkstemp(dir='.', prefix=file_name, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                os.chmod(tmp_name, 0o644)  # mkstemp makes it owner-only
+                _remember_trace(file_name, trace, tmp_name)
+            except BaseException:
+                try:
+                    os.remove(tmp_name)
+                except OSError:
+                    pass
+                raise
+            
+            self._send_json_bytes(_json_dumps({
                 "ok": True,
-                "id": trace['id']
-            }).encode())
+                "id": trace_id
+            }), status=201)
             
         except Exception as e:
             self.send_error(500, f"Save failed: {str(e)}")
     
     def _send_json_response(self, data):
         """Send JSON response"""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data, default=str).encode())
+        self._send_json_bytes(_json_dumps(data))
+    
+    def _send_json_bytes(self, body, status=200):
+        """Send an already-serialized JSON body"""
+        self._write_full(status, [
+            ('Content-type', 'application/json'),
+            ('Content-Length', len(body)),
+            ('Access-Control-Allow-Origin', '*'),
+        ], body)
+    
+    def _write_full(self, status, headers, body=b''):
+        """Send status line, headers and body with a single write"""
+        self.log_request(status)
+        lines = [
+            f"{self.protocol_version} {status} {self.responses[status][0]}",
+            f"Server: {self.version_string()}",
+            f"Date: {self.date_time_string()}",
+        ]
+        lines += [f"{name}: {value}" for name, value in headers]
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        self.wfile.write(head + body)
     
     def log_message(self, format, *args):
         """Quiet logging"""
@@ -810,7 +1158,8 @@ class DashboardHandler(BaseHTTPRequestHandler):
 def start_server(port=8000):
     """Start the dashboard server"""
     server_address = ('localhost', port)
-    httpd = HTTPServer(server_address, DashboardHandler)
+    httpd = ThreadingHTTPServer(server_address, DashboardHandler)
+    _load_index()
     
     print(f"""
     X-Ray Dashboard
@@ -820,7 +1169,7 @@ def start_server(port=8000):
     
     Trace files are in: {os.getcwd()}
     
-    Auto-refresh: Every 10 seconds (when not viewing trace)
+    Live updates: pushed when trace files change
     
     Press Ctrl+C to stop
     """)
@@ -3,9 +3,23 @@ Demo: Competitor Product Selection System with X-Ray Debugging
 """
 
 import random
+import re
 import time
+
+import numpy as np
+
 from xray_sdk.xray import xray
 
+# numba compiles the filter/score kernel to native code. Without it the
+# kernel still works, it just runs as ordinary Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
 # Mock product data
 MOCK_PRODUCTS = [
     {"id": "B001", "title": "HydroFlask 32oz Water Bottle", "price": 44.99, "rating": 4.5, "reviews": 8932},
@@ -20,14 +34,157 @@ MOCK_PRODUCTS = [
     {"id": "B010", "title": "Water Bottle Brush", "price": 12.99, "rating": 4.6, "reviews": 3421},
 ]
 
+# Lowercased title and its word set for each product, worked out once
+# instead of on every search
+MOCK_PRODUCTS_INDEX = [
+    (p, p["title"].lower(), frozenset(p["title"].lower().split()))
+    for p in MOCK_PRODUCTS
+]
+
+class _TrieNode:
+    __slots__ = ("children", "prefix_ids", "exact_ids")
+    
+    def __init__(self):
+        self.children = {}
+        self.prefix_ids = set()  # products with a key starting here
+        self.exact_ids = set()   # products with a key ending here
+
+class _ProductTrie:
+    """Character trie from keys to the positions (in MOCK_PRODUCTS_INDEX) of
+    the products they were inserted for"""
+    
+    _NONE = frozenset()
+    
+    def __init__(self):
+        self._root = _TrieNode()
+    
+    def insert(self, key, product_pos):
+        node = self._root
+        node.prefix_ids.add(product_pos)
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            node = child
+            node.prefix_ids.add(product_pos)
+        node.exact_ids.add(product_pos)
+    
+    def _find(self, key):
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+    
+    def query_exact(self, key):
+        """Products that have exactly this key"""
+        node = self._find(key)
+        return node.exact_ids if node else self._NONE
+    
+    def query_prefix(self, key):
+        """Products that have some key starting with this"""
+        node = self._find(key)
+        return node.prefix_ids if node else self._NONE
+
+# Two indexes over the catalog, so a search never scans every product:
+# - title words, for the word-overlap score
+# - every suffix of every title; a prefix of a suffix is a substring, so
+#   this answers "is the keyword somewhere in the title" for the phrase bonus
+def _build_search_tries():
+    word_trie = _ProductTrie()
+    suffix_trie = _ProductTrie()
+    for pos, (_, title_lower, words) in enumerate(MOCK_PRODUCTS_INDEX):
+        for word in words:
+            word_trie.insert(word, pos)
+        for start in range(len(title_lower) + 1):
+            suffix_trie.insert(title_lower[start:], pos)
+    return word_trie, suffix_trie
+
+_WORD_TRIE, _SUFFIX_TRIE = _build_search_tries()
+
+@njit(cache=True)
+def _score_parts(price, rating, reviews):
+    """The three 0-1 score components for one product"""
+    # Normalize scores (0-1 range)
+    reviews_score = min(reviews / 20000, 1.0)  # Cap at 20k reviews
+    rating_score = rating / 5.0  # 5-star scale
+    
+    # Price proximity: closer to $30 is better
+    price_score = max(0.0, 1 - abs(price - 30.0) / 100)  # Decrease with difference
+    
+    return reviews_score, rating_score, price_score
+
+@njit(cache=True)
+def _filter_and_score(prices, ratings, reviews, min_price, max_price, min_rating, min_reviews):
+    """One pass over the columns: filter checks and scores.
+    
+    Returns (price_ok, rating_ok, reviews_ok, total_scores). Only products
+    passing every filter are scored (others keep a score of -inf). Scores
+    are raw - rounding and ranking happen in Python (see rank_products),
+    since numba's round() isn't the same as Python's.
+    """
+    count = prices.shape[0]
+    price_ok = np.zeros(count, dtype=np.bool_)
+    rating_ok = np.zeros(count, dtype=np.bool_)
+    reviews_ok = np.zeros(count, dtype=np.bool_)
+    total_scores = np.full(count, -np.inf)
+    
+    for i in range(count):
+        price_ok[i] = min_price <= prices[i] <= max_price
+        rating_ok[i] = ratings[i] >= min_rating
+        reviews_ok[i] = reviews[i] >= min_reviews
+        if not (price_ok[i] and rating_ok[i] and reviews_ok[i]):
+            continue
+        
+        reviews_score, rating_score, price_score = _score_parts(prices[i], ratings[i], reviews[i])
+        
+        # Weighted total score
+        total = (
+            reviews_score * 0.4 +      # 40% weight to reviews (popularity)
+            rating_score * 0.35 +      # 35% weight to rating (quality)
+            price_score * 0.25         # 25% weight to price proximity
+        )
+        total_scores[i] = total
+    
+    return price_ok, rating_ok, reviews_ok, total_scores
+
+# Compile now (or load from numba's cache) for the argument types we use,
+# so the first pipeline run doesn't pay for it
+_score_parts(0.0, 0.0, 0.0)
+_filter_and_score(np.zeros(1), np.zeros(1), np.zeros(1, dtype=np.int64), 0.0, 0.0, 0.0, 0)
+_filter_and_score(np.zeros(1), np.zeros(1), np.zeros(1), 0.0, 0.0, 0.0, 0.0)
+
+# Key attribute words (whole words, any case) and "32oz"/"32 oz" (exact
+# text) all found in one scan of the title
+_KEYTERM_RE = re.compile(r"(?<!\S)(?i:(stainless|insulated|water|bottle))(?!\S)|32 ?oz")
+
+# Which found words each key term needs, in the order they're listed
+_KEY_TERMS = (
+    (frozenset(["stainless"]), "stainless steel"),
+    (frozenset(["insulated"]), "insulated"),
+    (frozenset(["water", "bottle"]), "water bottle"),
+    (frozenset(["32oz"]), "32oz"),
+)
+
 class CompetitorSelector:
     """Find competitor products for a given product"""
     
+    def __init__(self, simulate_latency=False):
+        # Demo storytelling only - pretend the steps call a slow LLM/API.
+        # Off by default so the real work is what gets timed
+        self.simulate_latency = simulate_latency
+    
+    def _simulate(self, seconds):
+        """Sleep like a real service would, if asked to"""
+        if self.simulate_latency:
+            time.sleep(seconds)
+    
     @xray.trace(name="Generate Search Keywords", step_type="llm")
     def generate_keywords(self, product_title):
         """Step 1: Generate search keywords from product title"""
         # Simulate LLM processing time
-        time.sleep(0.05)
+        self._simulate(0.05)
         
         # Generate keywords based on title
         words = product_title.lower().split()
@@ -37,15 +194,12 @@ class CompetitorSelector:
         keywords.append(product_title)
         
         # Strategy 2: Key attributes
-        key_terms = []
-        if "stainless" in words:
-            key_terms.append("stainless steel")
-        if "insulated" in words:
-            key_terms.append("insulated")
-        if "water" in words and "bottle" in words:
-            key_terms.append("water bottle")
-        if "32oz" in product_title or "32 oz" in product_title:
-            key_terms.append("32oz")
+        found = set()
+        for match in _KEYTERM_RE.finditer(product_title):
+            word = match.group(1)
+            # (lower() check, since re's ignore-case also accepts odd letters like "ſ")
+            found.add("32oz" if word is None else word.lower())
+        key_terms = [term for needed, term in _KEY_TERMS if needed <= found]
             
         if key_terms:
             keywords.append(" ".join(key_terms))
@@ -74,40 +228,37 @@ class CompetitorSelector:
     def search_products(self, keyword, limit=10):
         """Step 2: Search for products using keyword"""
         # Simulate API call latency
-        time.sleep(0.08)
+        self._simulate(0.08)
         
-        matches = []
         keyword_lower = keyword.lower()
-        
-        for product in MOCK_PRODUCTS:
-            title_lower = product["title"].lower()
-            product_words = set(title_lower.split())
-            keyword_words = set(keyword_lower.split())
-            
-            # Calculate match score
-            common_words = product_words.intersection(keyword_words)
-            match_score = len(common_words)
-            
-            # Bonus for exact phrase match
-            if keyword_lower in title_lower:
-                match_score += 2
+        keyword_words = frozenset(keyword_lower.split())
+        
+        # Calculate match score - one point per shared word
+        scores = {}
+        for word in keyword_words:
+            for pos in _WORD_TRIE.query_exact(word):
+                scores[pos] = scores.get(pos, 0) + 1
+        
+        # Bonus for exact phrase match
+        for pos in _SUFFIX_TRIE.query_prefix(keyword_lower):
+            scores[pos] = scores.get(pos, 0) + 2
+        
+        # Catalog order, so ties come out the same way as always
+        # (scores ride alongside the products - no copies of MOCK_PRODUCTS,
+        # so callers must not modify what they get back)
+        scored = []
+        for pos in sorted(scores):
+            match_score = scores[pos]
             
             if match_score >= 1:  # At least one word matches
-                product_copy = product.copy()
-                product_copy["match_score"] = match_score
-                matches.append(product_copy)
+                scored.append((match_score, MOCK_PRODUCTS_INDEX[pos][0]))
         
         # Sort by match score (highest first)
-        matches.sort(key=lambda x: x["match_score"], reverse=True)
+        scored.sort(key=lambda s: -s[0])
         
-        # Remove match_score from final results
-        results = []
-        for match in matches[:limit]:
-            result = match.copy()
-            result.pop("match_score", None)
-            results.append(result)
+        results = [product for _, product in scored[:limit]]
         
-        total_matches = len(matches)
+        total_matches = len(scored)
         returned_count = len(results)
         
         # Add reasoning BEFORE returning
@@ -120,10 +271,15 @@ class CompetitorSelector:
         return results
     
     @xray.trace(name="Apply Filters", step_type="filter")
-    def apply_filters(self, products, reference_price, min_rating=3.8, min_reviews=100):
-        """Step 3: Apply business filters to candidate products"""
+    def apply_filters(self, products, reference_price, min_rating=3.8, min_reviews=100,
+                      detail_limit=3):
+        """Step 3: Apply business filters to candidate products
+        
+        Detailed per-filter records are only built for the first
+        detail_limit products (the pipeline shows 3), None means all.
+        """
         # Simulate processing time
-        time.sleep(0.06)
+        self._simulate(0.06)
         
         filtered = []
         evaluations = []
@@ -138,54 +294,56 @@ class CompetitorSelector:
         min_rating = float(min_rating)
         min_reviews = int(min_reviews)
         
-        for product in products:
-            # Get product values
-            price = float(product["price"])
-            rating = float(product["rating"])
-            reviews = int(product["reviews"])
-            
-            # Check each filter
-            price_ok = min_price <= price <= max_price
-            rating_ok = rating >= min_rating
-            reviews_ok = reviews >= min_reviews
-            
-            passed = price_ok and rating_ok and reviews_ok
-            
-            # Create evaluation record
-            eval_record = {
-                "product_id": product["id"],
-                "product_title": product["title"],
-                "price": price,
-                "rating": rating,
-                "reviews": reviews,
-                "filter_results": {
-                    "price_range": {
-                        "passed": price_ok,
-                        "min": min_price,
-                        "max": max_price,
-                        "value": price,
-                        "detail": f"${price:.2f} is within ${min_price:.2f}-${max_price:.2f}" if price_ok 
-                                 else f"${price:.2f} is outside ${min_price:.2f}-${max_price:.2f}"
-                    },
-                    "min_rating": {
-                        "passed": rating_ok,
-                        "threshold": min_rating,
-                        "value": rating,
-                        "detail": f"{rating:.1f} >= {min_rating}" if rating_ok 
-                                 else f"{rating:.1f} < {min_rating}"
+        # Pull the filtered fields into columns and check everything at once
+        count = len(products)
+        prices = np.fromiter((float(p["price"]) for p in products), dtype=np.float64, count=count)
+        ratings = np.fromiter((float(p["rating"]) for p in products), dtype=np.float64, count=count)
+        reviews_arr = np.fromiter((int(p["reviews"]) for p in products), dtype=np.int64, count=count)
+        
+        price_mask, rating_mask, reviews_mask, _ = _filter_and_score(
+            prices, ratings, reviews_arr, min_price, max_price, min_rating, min_reviews
+        )
+        passed_mask = price_mask & rating_mask & reviews_mask
+        
+        # Back to plain Python values for the evaluation records
+        for i, (product, price, rating, reviews, price_ok, rating_ok, reviews_ok, passed) in enumerate(zip(
+            products, prices.tolist(), ratings.tolist(), reviews_arr.tolist(),
+            price_mask.tolist(), rating_mask.tolist(), reviews_mask.tolist(), passed_mask.tolist()
+        )):
+            # Full record, only for the products that get shown
+            if detail_limit is None or i < detail_limit:
+                detailed_evaluations.append({
+                    "product_id": product["id"],
+                    "product_title": product["title"],
+                    "price": price,
+                    "rating": rating,
+                    "reviews": reviews,
+                    "filter_results": {
+                        "price_range": {
+                            "passed": price_ok,
+                            "min": min_price,
+                            "max": max_price,
+                            "value": price,
+                            "detail": f"${price:.2f} is within ${min_price:.2f}-${max_price:.2f}" if price_ok 
+                                     else f"${price:.2f} is outside ${min_price:.2f}-${max_price:.2f}"
+                        },
+                        "min_rating": {
+                            "passed": rating_ok,
+                            "threshold": min_rating,
+                            "value": rating,
+                            "detail": f"{rating:.1f} >= {min_rating}" if rating_ok 
+                                     else f"{rating:.1f} < {min_rating}"
+                        },
+                        "min_reviews": {
+                            "passed": reviews_ok,
+                            "threshold": min_reviews,
+                            "value": reviews,
+                            "detail": f"{reviews} >= {min_reviews}" if reviews_ok 
+                                     else f"{reviews} < {min_reviews}"
+                        }
                     },
-                    "min_reviews": {
-                        "passed": reviews_ok,
-                        "threshold": min_reviews,
-                        "value": reviews,
-                        "detail": f"{reviews} >= {min_reviews}" if reviews_ok 
-                                 else f"{reviews} < {min_reviews}"
-                    }
-                },
-                "passed_all_filters": passed
-            }
-            
-            detailed_evaluations.append(eval_record)
+                    "passed_all_filters": passed
+                })
             
             # Simple evaluation for console
             evaluations.append({
@@ -204,20 +362,19 @@ class CompetitorSelector:
         passed_count = len(filtered)
         failed_count = total_products - passed_count
         
-        # Find most common failure reason
-        failure_stats = {"price": 0, "rating": 0, "reviews": 0}
-        for eval_item in detailed_evaluations:
-            if not eval_item["passed_all_filters"]:
-                filters = eval_item["filter_results"]
-                if not filters["price_range"]["passed"]:
-                    failure_stats["price"] += 1
-                if not filters["min_rating"]["passed"]:
-                    failure_stats["rating"] += 1
-                if not filters["min_reviews"]["passed"]:
-                    failure_stats["reviews"] += 1
-        
-        # Determine top failure reason
-        top_failure = max(failure_stats.items(), key=lambda x: x[1])
+        # Find most common failure reason (any failed check means the
+        # product failed overall, so this is just counting the misses)
+        price_fails = count - int(np.count_nonzero(price_mask))
+        rating_fails = count - int(np.count_nonzero(rating_mask))
+        reviews_fails = count - int(np.count_nonzero(reviews_mask))
+        
+        # Determine top failure reason (ties go to price, then rating)
+        if price_fails >= rating_fails and price_fails >= reviews_fails:
+            top_failure = ("price", price_fails)
+        elif rating_fails >= reviews_fails:
+            top_failure = ("rating", rating_fails)
+        else:
+            top_failure = ("reviews", reviews_fails)
         
         # Add reasoning BEFORE returning
         xray.add_reasoning(
@@ -234,51 +391,49 @@ class CompetitorSelector:
     def rank_products(self, products):
         """Step 4: Rank and select best competitor"""
         # Simulate ranking computation
-        time.sleep(0.04)
+        self._simulate(0.04)
         
         if not products:
             xray.add_reasoning("No products to rank - returning None")
             return None
         
-        scored_products = []
-        
-        for product in products:
-            # Normalize scores (0-1 range)
-            reviews_score = min(product["reviews"] / 20000, 1.0)  # Cap at 20k reviews
-            rating_score = product["rating"] / 5.0  # 5-star scale
-            
-            # Price proximity: closer to $30 is better
-            ideal_price = 30.0
-            price_diff = abs(product["price"] - ideal_price)
-            price_score = max(0, 1 - price_diff / 100)  # Decrease with difference
-            
-            # Weighted total score
-            total_score = (
-                reviews_score * 0.4 +      # 40% weight to reviews (popularity)
-                rating_score * 0.35 +       # 35% weight to rating (quality)
-                price_score * 0.25          # 25% weight to price proximity
-            )
-            
-            scored_products.append({
-                "product": product,
-                "score_breakdown": {
-                    "reviews_score": round(reviews_score, 3),
-                    "rating_score": round(rating_score, 3),
-                    "price_score": round(price_score, 3)
-                },
-                "total_score": round(total_score, 3)
-            })
+        # All products' scores at once, as columns
+        count = len(products)
+        reviews = np.fromiter((p["reviews"] for p in products), dtype=np.float64, count=count)
+        ratings = np.fromiter((p["rating"] for p in products), dtype=np.float64, count=count)
+        prices = np.fromiter((p["price"] for p in products), dtype=np.float64, count=count)
         
-        # Sort by total score (highest first)
-        scored_products.sort(key=lambda x: x["total_score"], reverse=True)
-        
-        # Add rank
-        for i, item in enumerate(scored_products):
-            item["rank"] = i + 1
+        # No filtering here - every product passes and gets ranked
+        _, _, _, total_scores = _filter_and_score(
+            prices, ratings, reviews, -np.inf, np.inf, -np.inf, -np.inf
+        )
         
-        best_product = scored_products[0]["product"]
-        best_score = scored_products[0]["total_score"]
-        best_breakdown = scored_products[0]["score_breakdown"]
+        # Top two by 3-decimal score, earlier product wins a tie (like a
+        # stable sort). Python's round() on purpose - NumPy's/numba's
+        # rounding disagree on halfway-ish values like 0.9275
+        best_idx = runner_up_idx = -1
+        best = runner_up_score = None
+        for i, total in enumerate(total_scores.tolist()):
+            score = round(total, 3)
+            if best is None or score > best:
+                runner_up_score, runner_up_idx = best, best_idx
+                best, best_idx = score, i
+            elif runner_up_score is None or score > runner_up_score:
+                runner_up_score, runner_up_idx = score, i
+        runner_up = products[runner_up_idx] if runner_up_idx >= 0 else None
+        
+        best_product = products[best_idx]
+        best_score = round(float(total_scores[best_idx]), 3)
+        
+        # Score breakdown, just for the winner
+        reviews_score, rating_score, price_score = _score_parts(
+            float(prices[best_idx]), float(ratings[best_idx]), float(reviews[best_idx])
+        )
+        best_breakdown = {
+            "reviews_score": round(reviews_score, 3),
+            "rating_score": round(rating_score, 3),
+            "price_score": round(price_score, 3)
+        }
         
         # Add reasoning BEFORE returning
         xray.add_reasoning(
@@ -287,17 +442,9 @@ class CompetitorSelector:
             f"Breakdown: Reviews={best_breakdown['reviews_score']:.3f}, "
             f"Rating={best_breakdown['rating_score']:.3f}, "
             f"Price={best_breakdown['price_score']:.3f}. "
-            f"Runner-up: '{scored_products[1]['product']['title'] if len(scored_products) > 1 else 'None'}'"
+            f"Runner-up: '{runner_up['title'] if runner_up is not None else 'None'}'"
         )
         
-        # Return both the best product and full ranking for X-Ray
-        xray_output = {
-            "selected": best_product,
-            "ranking": scored_products,
-            "total_candidates": len(products)
-        }
-        
-        # For backward compatibility, also return just the product
         return best_product
     
     def run_pipeline(self, prospect_product):
@@ -324,20 +471,15 @@ class CompetitorSelector:
             
             # Step 2: Search for each keyword
             print("\n [Step 2] Searching for products...")
-            all_candidates = []
+            unique_by_id = {}  # Removes duplicates by ID as we go (first one wins)
             for i, keyword in enumerate(keywords[:2], 1):  # Use first 2 keywords
                 print(f"   Search {i}/2: '{keyword}'")
                 results = self.search_products(keyword, limit=5)
-                all_candidates.extend(results)
+                for product in results:
+                    unique_by_id.setdefault(product["id"], product)
                 print(f"     Found {len(results)} products")
             
-            # Remove duplicates by ID
-            unique_candidates = []
-            seen_ids = set()
-            for product in all_candidates:
-                if product["id"] not in seen_ids:
-                    seen_ids.add(product["id"])
-                    unique_candidates.append(product)
+            unique_candidates = list(unique_by_id.values())
             
             print(f"    Total unique candidates: {len(unique_candidates)}")
             
@@ -413,8 +555,8 @@ class CompetitorSelector:
                 print(f"\n X-Ray trace saved: {saved_file}")
                 print("="*60)
 
-def main():
-    """Run the demo"""
+def main(simulate_latency=True):
+    """Run the demo (with fake service latency, so the trace timings tell a story)"""
     print("\n" + "="*60)
     print(" X-RAY DEBUGGING DEMO: Competitor Product Selection")
     print("="*60)
@@ -439,7 +581,7 @@ def main():
     print(f"   Category: {prospect_product['category']}")
     
     # Create selector and run pipeline
-    selector = CompetitorSelector()
+    selector = CompetitorSelector(simulate_latency=simulate_latency)
     result = selector.run_pipeline(prospect_product)
     
     print("\n" + "="*60)
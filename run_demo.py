@@ -11,13 +11,15 @@ import demo_app.competitor_selection as demo_module
 # Update the search logic
 original_search = demo_module.CompetitorSelector.search_products
 
+# Any of these anywhere in the title counts as a match ("hydro" -> "hydroflask")
+SEARCH_TERMS = ("water", "bottle", "hydro", "yeti", "stanley")
+
 def patched_search(self, keyword, limit=10):
     """Better search that actually finds products"""
     import demo_app.competitor_selection
     matches = []
-    for product in demo_app.competitor_selection.MOCK_PRODUCTS:
-        if any(word in product["title"].lower() 
-               for word in ["water", "bottle", "hydro", "yeti", "stanley"]):
+    for product, title_lower, _ in demo_app.competitor_selection.MOCK_PRODUCTS_INDEX:
+        if any(word in title_lower for word in SEARCH_TERMS):
             matches.append(product)
     
     # Return limited results
@@ -5,4 +5,9 @@ setup(
     name="xray-system",
     version="1.0.0",
     packages=find_packages(),
+    extras_require={
+        "fast": ["orjson"],
+        "demo": ["numpy"],
+        "jit": ["numba"],
+    },
 )
\ No newline at end of file
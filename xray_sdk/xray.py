@@ -3,28 +3,79 @@ xray.py - The debugger that actually tells you WHY things happened
 Not just what happened, but the story behind it.
 """
 
+import inspect
 import json
+import os
+import sys
 import time
-import uuid
 from datetime import datetime
 
+# orjson makes capturing inputs/outputs much cheaper, stdlib json works too
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _short_str(value):
+    # What we store for anything JSON can't hold natively
+    if isinstance(value, float):
+        return float(value)  # float subclasses (numpy etc) keep their value
+    try:
+        return str(value)[:150]  # Don't store giant strings
+    except Exception:
+        return f"Object of type {type(value).__name__}"
+
+
+def _to_json_bytes(value):
+    # Serialize in one pass - only odd objects come back to Python
+    try:
+        if orjson is not None:
+            return orjson.dumps(value, default=_short_str, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, default=_short_str).encode()
+    except (TypeError, ValueError, OverflowError):
+        # Weird keys, huge ints... do it the slow way
+        return json.dumps(_make_json_safe(value)).encode()
+
+
+def _make_json_safe(value):
+    # Make sure we can store this in JSON
+    if value is None:
+        return None
+    elif isinstance(value, (str, int, float, bool)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return [_make_json_safe(item) for item in value]
+    elif isinstance(value, dict):
+        return {str(k): _make_json_safe(v) for k, v in value.items()}
+    else:
+        # For complex objects, just show type
+        return _short_str(value)
+
+
 # Each step in our detective story
 class XRayStep:
     # When something happens, we write it down
+    # (one of these per traced call, so no per-instance __dict__)
+    __slots__ = (
+        "id", "name", "step_type", "_input_json", "_output_json", "reasoning",
+        "_timestamp", "duration_ms", "success", "error", "_start_time",
+    )
     
-    def __init__(self, name: str, step_type: str = "generic"):
-        # Give this step a unique ID - like case file number
-        self.id = str(uuid.uuid4())[:8]  # Short ID, easier to read
+    def __init__(self, name: str, step_type: str = "generic", step_id: str = ""):
+        # Give this step an ID - like case file number
+        # (XRay hands out short ones that are unique within a trace)
+        self.id = step_id
         self.name = name
         self.step_type = step_type
         
-        # What went in, what came out
-        self.input = {}
-        self.output = {}
+        # What went in, what came out (kept as JSON bytes, see input/output)
+        self._input_json = b"{}"
+        self._output_json = b"{}"
         self.reasoning = ""  # The "why" - most important part
         
-        # When did this happen
-        self.timestamp = datetime.now().isoformat()
+        # When did this happen (formatted later, see timestamp)
+        self._timestamp = None
         self.duration_ms = 0
         self.success = True
         self.error = None
@@ -32,6 +83,35 @@ class XRayStep:
         # Start the clock
         self._start_time = time.time()
         
+    @property
+    def timestamp(self):
+        # Formatting dates isn't free, so only do it when someone asks
+        if self._timestamp is None:
+            self._timestamp = datetime.fromtimestamp(self._start_time).isoformat()
+        return self._timestamp
+        
+    @timestamp.setter
+    def timestamp(self, value):
+        self._timestamp = value
+        
+    # input/output are stored as JSON bytes - reading decodes a fresh copy,
+    # assigning encodes (so change them by assigning, not in place)
+    @property
+    def input(self):
+        return json.loads(self._input_json)
+        
+    @input.setter
+    def input(self, value):
+        self._input_json = _to_json_bytes(value)
+        
+    @property
+    def output(self):
+        return json.loads(self._output_json)
+        
+    @output.setter
+    def output(self, value):
+        self._output_json = _to_json_bytes(value)
+        
     def end(self):
         # Stop timing
         self.duration_ms = (time.time() - self._start_time) * 1000
@@ -64,20 +144,40 @@ class XRay:
     def __init__(self):
         # We're keeping cases (traces) in memory
         self.current_trace_id = None
+        self._trace_start = 0.0
         self.traces = {}
         self._current_step = None  # What step are we in right now?
+        self._step_counter = 0  # Numbers the steps in the current trace
+        self._current_trace_total_ms = 0.0  # Running total, so end_trace needn't add up
+        
+        # XRAY_DISABLED=1 turns all of this off (decorators become no-ops)
+        self._enabled = os.environ.get("XRAY_DISABLED") != "1"
+        
+        # Step details only go to a real terminal (XRAY_QUIET=1 hides them too).
+        # sys.stdout can be None (pythonw, some daemons) - that's no terminal
+        is_tty = getattr(sys.stdout, "isatty", lambda: False)()
+        self._verbose = is_tty and os.environ.get("XRAY_QUIET") != "1"
         
     def start_trace(self, trace_name: str = ""):
         # Start a new investigation
+        if not self._enabled:
+            return None
+        
         timestamp = int(time.time())
-        short_id = uuid.uuid4().hex[:8]
+        # Much cheaper than uuid4, and leaves the app's (maybe seeded) random alone
+        short_id = os.urandom(4).hex()
         self.current_trace_id = f"trace_{timestamp}_{short_id}"
+        self._step_counter = 0
+        self._current_trace_total_ms = 0.0
         
         # Create case file
+        # (start_time is filled in at end_trace, and steps stay XRayStep
+        # objects until then - no date formatting or dict copies mid-trace)
+        self._trace_start = time.time()
         self.traces[self.current_trace_id] = {
             "id": self.current_trace_id,
             "name": trace_name,
-            "start_time": datetime.now().isoformat(),
+            "start_time": None,
             "steps": []  # Empty for now
         }
         
@@ -91,20 +191,37 @@ class XRay:
         Decorator to wrap any function.
         Put @xray.trace above any function you want to track.
         """
+        if not self._enabled:
+            # Hand the function back untouched - no overhead per call
+            def decorator(func):
+                return func
+            return decorator
+        
         def decorator(func):
+            # Work out once whether the first argument is the receiver
+            # ('self', or 'cls' for classmethods)
+            try:
+                params = inspect.signature(func).parameters
+                is_method = next(iter(params), None) in ("self", "cls")
+            except (TypeError, ValueError):
+                is_method = False  # No signature (some builtins)
+            
             def wrapper(*args, **kwargs):
                 # Start tracking this step
-                self._current_step = XRayStep(name, step_type)
+                self._step_counter += 1
+                self._current_step = XRayStep(
+                    name, step_type, step_id=f"s{self._step_counter:04x}"
+                )
                 
                 # Note down what went in
-                self._current_step.input = self._capture_input(args, kwargs)
+                self._current_step._input_json = self._capture_input(args, kwargs, is_method)
                 
                 try:
                     # Actually run the function
                     result = func(*args, **kwargs)
                     
                     # Note down what came out
-                    self._current_step.output = {"result": self._make_json_safe(result)}
+                    self._current_step._output_json = _to_json_bytes({"result": result})
                     self._current_step.success = True
                     
                     return result
@@ -122,8 +239,10 @@ class XRay:
                     # Add to case file
                     if self.current_trace_id and self.current_trace_id in self.traces:
                         self.traces[self.current_trace_id]["steps"].append(
-                            self._current_step.to_dict()
+                            self._current_step
                         )
+                        # Same rounding as the saved step, so the totals agree
+                        self._current_trace_total_ms += round(self._current_step.duration_ms, 2)
                     
                     # Show what happened
                     self._show_step_info(self._current_step)
@@ -135,6 +254,8 @@ class XRay:
         return decorator
     
     def add_reasoning(self, reasoning: str):
+        if not self._enabled:
+            return
         if self._current_step:
             self._current_step.add_reasoning(reasoning)
         else:
@@ -142,21 +263,21 @@ class XRay:
                 steps = self.traces[self.current_trace_id]["steps"]
                 if steps:
                     # APPEND to existing reasoning, not overwrite!
-                    if "reasoning" in steps[-1]:
-                        steps[-1]["reasoning"] += f"\n{reasoning}"
-                    else:
-                        steps[-1]["reasoning"] = reasoning
+                    steps[-1].reasoning += f"\n{reasoning}"
     def end_trace(self):
         # Close the case file
-        if not self.current_trace_id:
+        if not self._enabled or not self.current_trace_id:
             return None
         
         trace = self.traces[self.current_trace_id]
+        trace["start_time"] = datetime.fromtimestamp(self._trace_start).isoformat()
+        trace["steps"] = [step.to_dict() for step in trace["steps"]]
         trace["end_time"] = datetime.now().isoformat()
         trace["total_steps"] = len(trace["steps"])
         
-        # Add up all the time
-        total_time = sum(step["duration_ms"] for step in trace["steps"])
+        # All the time (added up as the steps finished)
+        total_time = self._current_trace_total_ms
+        self._current_trace_total_ms = 0.0
         trace["total_duration_ms"] = round(total_time, 2)
         
         print(f"\n Investigation complete")
@@ -179,64 +300,64 @@ class XRay:
         if trace_id in self.traces:
             filename = f"trace_{trace_id}.json"
             try:
-                with open(filename, 'w') as f:
-                    json.dump(self.traces[trace_id], f, indent=2)
+                trace = self.traces[trace_id]
+                data = None
+                if orjson is not None:
+                    try:
+                        data = orjson.dumps(trace, option=orjson.OPT_INDENT_2)
+                    except TypeError:
+                        pass  # Huge ints, lone surrogates... stdlib json copes
+                if data is None:
+                    # No pretty-printing here, it's the slow part of json
+                    data = json.dumps(trace, separators=(",", ":")).encode()
+                with open(filename, 'wb') as f:
+                    f.write(data)
                 print(f"   Saved to: {filename}")
             except Exception as e:
                 print(f"   Couldn't save: {e}")
     
-    def _capture_input(self, args, kwargs):
-        # Convert function arguments to something we can store
+    def _capture_input(self, args, kwargs, is_method=False):
+        # Convert function arguments to JSON bytes we can store
         input_data = {}
         
         # Skip 'self' if it's a method
         start_idx = 0
-        if args and hasattr(args[0], '__class__'):
-            # It's probably a method, skip 'self'
+        if is_method and args:
             input_data["self"] = f"{args[0].__class__.__name__} object"
             start_idx = 1
         
         # Add all other arguments
         for i, arg in enumerate(args[start_idx:], start=start_idx):
-            input_data[f"arg_{i}"] = self._make_json_safe(arg)
+            input_data[f"arg_{i}"] = arg
         
         # Add keyword arguments
-        for key, value in kwargs.items():
-            input_data[key] = self._make_json_safe(value)
+        input_data.update(kwargs)
         
-        return input_data
-    
-    def _make_json_safe(self, value):
-        # Make sure we can store this in JSON
-        if value is None:
-            return None
-        elif isinstance(value, (str, int, float, bool)):
-            return value
-        elif isinstance(value, (list, tuple)):
-            return [self._make_json_safe(item) for item in value]
-        elif isinstance(value, dict):
-            return {str(k): self._make_json_safe(v) for k, v in value.items()}
-        else:
-            # For complex objects, just show type
-            try:
-                return str(value)[:150]  # Don't store giant strings
-            except:
-                return f"Object of type {type(value).__name__}"
+        return _to_json_bytes(input_data)
     
     def _show_step_info(self, step):
         # Print step details to console
+        if not self._verbose:
+            return
+        
         status = "PASS" if step.success else "FAIL"
         
-        print(f"\n Step: {step.name}")
-        print(f"   Type: {step.step_type}")
-        print(f"   Status: {status}")
-        print(f"   Time: {step.duration_ms:.2f}ms")
+        lines = [
+            f"\n Step: {step.name}",
+            f"   Type: {step.step_type}",
+            f"   Status: {status}",
+            f"   Time: {step.duration_ms:.2f}ms",
+        ]
         
         if step.reasoning:
-            print(f"   Why: {step.reasoning}")
+            lines.append(f"   Why: {step.reasoning}")
         
         if step.error:
-            print(f"   Error: {step.error}")
+            lines.append(f"   Error: {step.error}")
+        
+        # One write instead of a print per line
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
 
 # Create one global detective everyone can use
 # Just import 'xray' and start decorating functions